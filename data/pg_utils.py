@@ -52,6 +52,9 @@ _pg_numeric_col_types = ["smallint","integer","bigint","double precision",
                       "bigserial"]
 _text_col_types = ["character varying", "text"]
 
+#Column names of tables keyed by table name
+_table_column_names_cache = {}
+
 #Flags for specifying data source type
 VIEWS = 2500
 TABLES = 2501
@@ -358,6 +361,29 @@ def table_column_names(tableName, spatialColumns=False, creation_order=False):
            
     return columnNames
 
+def cached_table_column_names(table_name):
+    """
+    Returns the column names of the given table name. The names are only
+    queried once per table, use :func:`clear_table_column_names_cache` once
+    the table has been altered.
+    :param table_name: Name of the table or view.
+    :type table_name: str
+    :return: Column names of the table.
+    :rtype: frozenset
+    """
+    if not table_name in _table_column_names_cache:
+        _table_column_names_cache[table_name] = frozenset(
+            table_column_names(table_name)
+        )
+
+    return _table_column_names_cache[table_name]
+
+def clear_table_column_names_cache():
+    """
+    Removes the column names cached by :func:`cached_table_column_names`.
+    """
+    _table_column_names_cache.clear()
+
 def non_spatial_table_columns(table):
     """
     Returns non spatial table columns.
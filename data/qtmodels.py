@@ -440,13 +440,26 @@ class PersonTableModel(QAbstractTableModel):
     
 class BaseSTDMTableModel(QAbstractTableModel):
     """
-    Generic table model for use in STDM table views.
+    Generic table model for use in STDM table views. The rows are stored as
+    tuples, which are replaced as a whole when a cell value is set, hence
+    rows can safely be shared between models.
     """
-    def __init__(self, initdata, headerdata, parent=None):
+    def __init__(self, initdata, headerdata, parent=None, formatters=None):
+        """
+        :param formatters: Functions, in column order, for formatting the
+        cell values for display. A column whose formatter is None is
+        displayed as is. The values are formatted when the cells are
+        displayed, cell values should therefore not be formatted beforehand.
+        :type formatters: list
+        """
         QAbstractTableModel.__init__(self,parent)
 
         self._initData = initdata
         self._headerdata = headerdata
+        self._formatters = formatters
+
+        #Row numbers keyed by the value in the first column, built on demand
+        self._id_rows = None
 
     def rowCount(self, parent=QModelIndex()):
         return len(self._initData)
@@ -467,6 +480,9 @@ class BaseSTDMTableModel(QAbstractTableModel):
             return None
 
         elif role == Qt.DisplayRole:
+            if not self._formatters is None:
+                indexData = self._display_value(index.column(), indexData)
+
             #Decimal not supported by QVariant so we adapt it to a supported type
             if isinstance(indexData,Decimal):
                 return str(indexData)
@@ -477,6 +493,42 @@ class BaseSTDMTableModel(QAbstractTableModel):
         else:
             return None
 
+    def row_for_id(self, id_value):
+        """
+        Searches for the row whose first column contains the given value,
+        which is normally the record id.
+        :param id_value: Value in the first column.
+        :return: Returns the row number or -1 if there is no matching row.
+        :rtype: int
+        """
+        if self._id_rows is None:
+            self._id_rows = dict(
+                (r[0], i) for i, r in enumerate(self._initData)
+            )
+
+        return self._id_rows.get(id_value, -1)
+
+    def id_for_row(self, row):
+        """
+        :param row: Row number in the model.
+        :type row: int
+        :return: Returns the value in the first column of the given row,
+        which is normally the record id.
+        """
+        return self._initData[row][0]
+
+    def _display_value(self, column, value):
+        #Formats the cell value using the formatter of the column
+        formatter = self._formatters[column]
+        if formatter is None:
+            return value
+
+        #Display the value as is if it cannot be formatted
+        try:
+            return formatter(value)
+        except Exception:
+            return value
+
     def headerData(self, section, orientation, role):
         if orientation == Qt.Horizontal and role == Qt.DisplayRole:
             return self._headerdata[section]
@@ -488,7 +540,13 @@ class BaseSTDMTableModel(QAbstractTableModel):
 
     def setData(self, index, value, role=Qt.EditRole):
         if index.isValid() and role == Qt.EditRole:
-            self._initData[index.row()][index.column()] = value
+            row = list(self._initData[index.row()])
+            row[index.column()] = value
+            self._initData[index.row()] = tuple(row)
+
+            if index.column() == 0:
+                self._id_rows = None
+
             self.dataChanged.emit(index,index)
 
             return True
@@ -509,7 +567,10 @@ class BaseSTDMTableModel(QAbstractTableModel):
         self.beginInsertRows(parent, position, position + rows - 1)
 
         #Initialize column values for the new row
-        initRowVals = ["" for c in range(self.columnCount())]
+        initRowVals = tuple(["" for c in range(self.columnCount())])
+
+        #Row numbers have shifted
+        self._id_rows = None
 
         for i in range(rows):
             self._initData.insert(position,initRowVals)
@@ -518,6 +579,35 @@ class BaseSTDMTableModel(QAbstractTableModel):
 
         return True
 
+    def appendRows(self, rows, parent=QModelIndex()):
+        """
+        Appends a batch of rows at the end of the model using a single
+        insert notification, so that views are only updated once per batch.
+        :param rows: Iterable containing the row values to append.
+        :type rows: iterable
+        :return: Returns True if one or more rows were appended, otherwise
+        False.
+        :rtype: bool
+        """
+        rows = list(rows)
+        num_rows = len(rows)
+
+        if num_rows == 0:
+            return False
+
+        position = len(self._initData)
+
+        self.beginInsertRows(parent, position, position + num_rows - 1)
+        self._initData.extend(rows)
+
+        if not self._id_rows is None:
+            for i, r in enumerate(rows, position):
+                self._id_rows[r[0]] = i
+
+        self.endInsertRows()
+
+        return True
+
     def removeRows(self, position, count, parent=QModelIndex()):
 
         if position < 0 or position > len(self._initData):
@@ -525,6 +615,9 @@ class BaseSTDMTableModel(QAbstractTableModel):
 
         self.beginRemoveRows(parent,position,position + count - 1)
 
+        #Row numbers have shifted
+        self._id_rows = None
+
         for i in range(count):
             try:
                 del self._initData[position]
@@ -55,6 +55,7 @@ from stdm.ui.options_base import OptionsDialog
 from stdm.ui.view_str import ViewSTRWidget
 from stdm.ui.admin_unit_selector import AdminUnitSelector
 from stdm.ui.entity_browser import (
+    clear_result_cache,
     EntityBrowserWithEditor
 )
 from stdm.ui.about import AboutSTDMDialog
@@ -79,7 +80,8 @@ from stdm.data.pg_utils import (
     spatial_tables,
     postgis_exists,
     create_postgis,
-    table_column_names
+    table_column_names,
+    clear_table_column_names_cache
 )
 from stdm.settings.registryconfig import (
     RegistryConfig,
@@ -1913,6 +1915,8 @@ class STDMQGISLoader(object):
                 if not data.app_dbconn is None:
                     STDMDb.cleanUp()
                     DeclareMapping.cleanUp()
+                    clear_table_column_names_cache()
+                    clear_result_cache()
                 #Remove database reference
                 data.app_dbconn = None
             else:
@@ -20,6 +20,11 @@ email                : stdm@unhabitat.org
 """
 from datetime import date
 from collections import OrderedDict
+from operator import (
+    attrgetter,
+    itemgetter
+)
+import time
 
 import cProfile
 from PyQt4.QtCore import *
@@ -32,15 +37,21 @@ from qgis.core import (
     QgsCoordinateReferenceSystem
 )
 
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
 from stdm.data.configuration import entity_model
 from stdm.data.configuration.columns import (
+    BooleanColumn,
     GeometryColumn,
+    LookupColumn,
     MultipleSelectColumn,
     VirtualColumn
 )
 from stdm.data.configuration.entity import Entity
+from stdm.data.database import STDMDb
 from stdm.data.pg_utils import(
-    table_column_names,
+    cached_table_column_names,
     qgsgeometry_from_wkbelement,
     export_data,
     fetch_from_table,
@@ -82,6 +93,162 @@ from stdm.settings import get_entity_browser_record_limit
 
 __all__ = ["EntityBrowser", "EntityBrowserWithEditor", "ContentGroupEntityBrowser"]
 
+# Number of records fetched and added to the table model in one batch
+FETCH_CHUNK_SIZE = 500
+
+# Minimum number of loaded records before the progress dialog is shown
+PROGRESS_DIALOG_THRESHOLD = 500
+
+# Milliseconds to wait after the last keystroke before filtering records
+FILTER_DELAY = 150
+
+# Number of rows sampled when resizing columns to their contents
+RESIZE_CONTENTS_PRECISION = 50
+
+# Space for the sort indicator and margins when fitting a column to its header
+HEADER_WIDTH_PADDING = 24
+
+# Widget factories used for formatting values keyed by column type info
+_WIDGET_FACTORIES = {}
+
+# Loaded records of the browsed entities keyed by entity name. Each value
+# is a tuple of (expiry time, record limit, headers, rows).
+_RESULT_CACHE = {}
+
+# Number of times the cached records of each entity have been invalidated
+_RESULT_VERSIONS = {}
+
+
+def _cached_result(entity_name, record_limit, headers):
+    """
+    :return: Returns the cached rows for the given entity if they have not
+    expired and were loaded with the same record limit and headers,
+    otherwise None.
+    :rtype: list
+    """
+    result = _RESULT_CACHE.get(entity_name, None)
+    if result is None:
+        return None
+
+    expiry, limit, cached_headers, rows = result
+    if time.time() > expiry:
+        del _RESULT_CACHE[entity_name]
+
+        return None
+
+    if limit != record_limit or cached_headers != headers:
+        return None
+
+    return rows
+
+
+def _value_formatter(formatter, share_values=False):
+    """
+    Creates a function that formats a column value for display.
+    :param formatter: Widget factory used to format the value.
+    :type formatter: ColumnWidgetRegistry
+    :param share_values: True if the column has few distinct values, in
+    which case each value is only formatted once and the display value is
+    shared by all the rows in the column.
+    :type share_values: bool
+    :return: Function that returns the display value of a column value.
+    :rtype: callable
+    """
+    format_value = formatter.format_column_value
+
+    if share_values:
+        display_values = {}
+
+        def shared_display_value(value):
+            # No need of formatter for None value
+            if value is None:
+                return value
+
+            if value not in display_values:
+                display_values[value] = format_value(value)
+
+            return display_values[value]
+
+        return shared_display_value
+
+    def display_value(value):
+        # No need of formatter for None value
+        if value is None:
+            return value
+
+        return format_value(value)
+
+    return display_value
+
+
+def _formatted_value_getter(getter, value_formatter):
+    """
+    :return: Returns a function that extracts a value from a record using
+    the given getter and formats it for display.
+    :rtype: callable
+    """
+    def formatted_value(record):
+        return value_formatter(getter(record))
+
+    return formatted_value
+
+
+def _widget_factory(type_info):
+    """
+    :return: Returns the widget factory registered for the given column type
+    info, the lookup is only done once per type info.
+    :rtype: ColumnWidgetRegistry
+    """
+    if not type_info in _WIDGET_FACTORIES:
+        _WIDGET_FACTORIES[type_info] = ColumnWidgetRegistry.factory(type_info)
+
+    return _WIDGET_FACTORIES[type_info]
+
+
+def _cache_result(entity_name, record_limit, headers, rows, ttl):
+    """
+    Caches the loaded rows of the given entity for the specified number of
+    seconds. Expired results of other entities are removed so that they are
+    not retained once they are no longer browsed.
+    """
+    now = time.time()
+
+    for name, result in _RESULT_CACHE.items():
+        if now > result[0]:
+            del _RESULT_CACHE[name]
+
+    _RESULT_CACHE[entity_name] = (now + ttl, record_limit, headers, rows)
+
+
+def clear_result_cache():
+    """
+    Removes the cached records of all entities e.g. when the user logs out.
+    """
+    _RESULT_CACHE.clear()
+
+
+def invalidate_result_cache(entity_name):
+    """
+    Removes the cached records of the entity with the given name so that
+    they are reloaded from the database the next time they are browsed.
+    :param entity_name: Name of the entity.
+    :type entity_name: str
+    """
+    _RESULT_CACHE.pop(entity_name, None)
+
+    # Records still being loaded are no longer current
+    _RESULT_VERSIONS[entity_name] = _result_version(entity_name) + 1
+
+
+def _result_version(entity_name):
+    """
+    :return: Returns the number of times the cached records of the given
+    entity have been invalidated.
+    :rtype: int
+    """
+    return _RESULT_VERSIONS.get(entity_name, 0)
+
+
 class _EntityDocumentViewerHandler(object):
     """
     Class that loads the document viewer to display all documents
@@ -164,6 +331,87 @@ class _EntityDocumentViewerHandler(object):
         return dir.exists()
 
 
+class _EntityLoaderSignals(QObject):
+    """
+    Signals raised by the entity loader. A QRunnable is not a QObject hence
+    it cannot define signals itself. Each signal contains the load
+    generation of the loader so that signals, which are queued, from a
+    previous load can be ignored.
+    """
+    # Contains a list of fetched records
+    chunkReady = pyqtSignal(int, object)
+
+    # Contains the error message
+    error = pyqtSignal(int, unicode)
+
+    finished = pyqtSignal(int)
+
+
+class _EntityLoader(QRunnable):
+    """
+    Fetches the records of the specified columns in a worker thread and
+    emits them in chunks. The records are fetched using a separate session
+    since the default session cannot be shared across threads.
+    """
+    def __init__(self, columns, limit, chunk_size=FETCH_CHUNK_SIZE,
+                 generation=0):
+        QRunnable.__init__(self)
+        self._generation = generation
+        self._columns = columns
+        self._limit = limit
+        self._chunk_size = chunk_size
+        self._cancelled = False
+
+        self.signals = _EntityLoaderSignals()
+
+    def cancel(self):
+        """
+        Stops fetching the records. No more signals will be emitted.
+        """
+        self._cancelled = True
+
+    def run(self):
+        session = None
+
+        try:
+            Session = sessionmaker(bind=STDMDb.instance().engine)
+            session = Session()
+
+            query = session.query(*self._columns).limit(
+                self._limit
+            ).yield_per(self._chunk_size)
+
+            records_chunk = []
+            for r in query:
+                if self._cancelled:
+                    return
+
+                records_chunk.append(r)
+
+                if len(records_chunk) == self._chunk_size:
+                    self.signals.chunkReady.emit(
+                        self._generation, records_chunk
+                    )
+                    records_chunk = []
+
+            if self._cancelled:
+                return
+
+            if len(records_chunk) > 0:
+                self.signals.chunkReady.emit(self._generation, records_chunk)
+
+            self.signals.finished.emit(self._generation)
+
+        except Exception as ex:
+            # Any error has to be reported otherwise the browser will wait
+            # for the records indefinitely.
+            self.signals.error.emit(self._generation, unicode(ex))
+
+        finally:
+            if not session is None:
+                session.close()
+
+
 class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
     """
     Dialog for browsing entity records in a table view.
@@ -174,6 +422,9 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
     # the record id of the selected row.
 
     recordSelected = pyqtSignal(int)
+
+    # Number of seconds for which loaded records are reused
+    RESULT_CACHE_TTL = 60
     
     def __init__(self, entity, parent=None, state=MANAGE, load_records=True, plugin=None):
         QDialog.__init__(self,parent)
@@ -215,12 +466,19 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         self._dbmodel = entity_model(entity)
         self._state = state
         self._tableModel = None
+        self._proxyModel = None
+        self._progressDialog = None
         self._parent = parent
         self._data_initialized = False
         self._notifBar = NotificationBar(self.vlNotification)
         self._headers = []
         self._entity_attrs = []
+        self._entity_cols = []
         self._cell_formatters = {}
+        self._row_builders = []
+        self._value_formatters = []
+        self._shared_value_attrs = set()
+        self._virtual_attrs = set()
         self.filtered_records = []
         self._searchable_columns = OrderedDict()
         self._show_docs_col = False
@@ -228,6 +486,30 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         #ID of a record to select once records have been added to the table
         self._select_item = None
         self.current_records = 0
+        self._num_records = 0
+        self._loader = None
+        # Incremented each time the records are reloaded
+        self._load_generation = 0
+        self._loading = False
+
+        # Delays filtering the records while the user is typing
+        self._pending_filter_text = ''
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setInterval(FILTER_DELAY)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.timeout.connect(self._apply_filter)
+
+        # Connected once rather than each time the records are reloaded
+        self.cboFilterColumn.currentIndexChanged.connect(
+            self.onFilterColumnChanged
+        )
+        self.txtFilterPattern.textChanged.connect(self.onFilterRegExpChanged)
+
+        # Labels used in the window title when the records are counted
+        self._showing_str = QApplication.translate('EntityBrowser', 'Showing')
+        self._row_str = QApplication.translate('EntityBrowser', 'row')
+        self._rows_str = QApplication.translate('EntityBrowser', 'rows')
+        self._loaded_rows = []
 
         self.record_limit = self.get_records_limit() #get_entity_browser_record_limit()
 
@@ -378,10 +660,15 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         This is for improved user experience i.e. to prevent the dialog from taking
         long to load.
         '''
-        self.setWindowTitle(unicode(self.title()))
+        self.setWindowTitle(self.title())
 
         if self._data_initialized:
             return
+
+        # Set before loading since closing the dialog while the records are
+        # loading resets it.
+        self._data_initialized = True
+
         try:
             if not self._dbmodel is None:
                 # cProfile.runctx('self._initializeData()', globals(), locals())
@@ -390,8 +677,6 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         except Exception as ex:
             pass
 
-        self._data_initialized = True
-
     def hideEvent(self,hideEvent):
         '''
         Override event which just sets a flag to indicate that the data records have already been
@@ -399,6 +684,21 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         '''
         pass
 
+    def done(self, result):
+        '''
+        Override so that records still being fetched are not loaded once the
+        dialog has been closed. The records are reloaded the next time the
+        dialog is shown.
+        '''
+        if self._loading:
+            self._stop_loader()
+            self._load_generation += 1
+            self._loading = False
+            self._data_initialized = False
+            self._hide_progress()
+
+        QDialog.done(self, result)
+
     def clear_selection(self):
         """
         Deselects all selected items in the table view.
@@ -411,14 +711,20 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         """
         self._notifBar.clear()
 
-    def recomputeRecordCount(self, init_data=False):
+    def recomputeRecordCount(self, init_data=False, known_count=None):
         '''
         Get the number of records in the specified table and updates the window title.
+        :param known_count: Number of records in the table if already known,
+        in which case the database will not be queried.
+        :type known_count: int
         '''
-        entity = self._dbmodel()
+        if known_count is None:
+            entity = self._dbmodel()
 
-        # Get number of records
-        numRecords = entity.queryObject().count()
+            # Get number of records
+            numRecords = entity.queryObject().count()
+        else:
+            numRecords = known_count
         if init_data:
             if self.current_records < 1:
                 if numRecords > self.record_limit:
@@ -426,15 +732,17 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
                 else:
                     self.current_records = numRecords
 
-        rowStr = QApplication.translate('EntityBrowser', 'row') \
-            if numRecords == 1 \
-            else QApplication.translate('EntityBrowser', 'rows')
-        showing = QApplication.translate('EntityBrowser', 'Showing')
+        rowStr = self._row_str if numRecords == 1 else self._rows_str
         windowTitle = u"{0} - {1} {2} of {3} {4}".format(
-            self.title(), showing, self.current_records, numRecords, rowStr
+            self.title(),
+            self._showing_str,
+            self.current_records,
+            numRecords,
+            rowStr
         )
 
         self.setWindowTitle(windowTitle)
+        self._num_records = numRecords
 
         return numRecords
 
@@ -445,9 +753,18 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         formatters.
         """
         self._headers[:] = []
+        self._entity_attrs[:] = []
+        self._entity_cols[:] = []
+        self._shared_value_attrs.clear()
+        self._virtual_attrs.clear()
         table_name = self._entity.name
-        columns = table_column_names(table_name)
+        # Set of column names for constant time membership checks
+        columns = cached_table_column_names(table_name)
         missing_columns = []
+        dbmodel = self._dbmodel
+
+        # Virtual columns are only accessible through the mapped relationship
+        has_virtual_columns = False
 
         header_idx = 0
 
@@ -460,14 +777,16 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
             if isinstance(c, GeometryColumn):
                 continue
 
+            is_virtual = isinstance(c, VirtualColumn)
+            col_name = c.name
+
             # Do not include virtual columns in list of missing columns
-            if not c.name in columns and not isinstance(c, VirtualColumn):
-                missing_columns.append(c.name)
+            if not is_virtual and not col_name in columns:
+                missing_columns.append(col_name)
 
             else:
                 header = c.ui_display()
                 self._headers.append(header)
-                col_name = c.name
 
                 '''
                 If it is a virtual column then use column name as the header
@@ -475,26 +794,45 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
                 relationship) as the entity attribute name.
                 '''
 
-                if isinstance(c, MultipleSelectColumn):
-                    col_name = c.model_attribute_name
+                if is_virtual:
+                    if isinstance(c, MultipleSelectColumn):
+                        col_name = c.model_attribute_name
+
+                    has_virtual_columns = True
+                    self._virtual_attrs.add(col_name)
+                else:
+                    self._entity_cols.append(getattr(dbmodel, col_name))
 
                 self._entity_attrs.append(col_name)
 
+                # Lookup and boolean columns have few distinct values
+                if isinstance(c, (LookupColumn, BooleanColumn)):
+                    self._shared_value_attrs.add(col_name)
+
                 # Get widget factory so that we can use the value formatter
-                w_factory = ColumnWidgetRegistry.factory(c.TYPE_INFO)
+                w_factory = _widget_factory(c.TYPE_INFO)
                 if not w_factory is None:
-                    formatter = w_factory(c)
-                    self._cell_formatters[col_name] = formatter
+                    self._cell_formatters[col_name] = w_factory(c)
 
                 # Set searchable columns
                 if c.searchable:
-                    self._searchable_columns[c.ui_display()] = {
+                    self._searchable_columns[header] = {
                         'name': c.name,
                         'header_index': header_idx
                     }
 
                 header_idx += 1
 
+        '''
+        Columns can only be projected in the query if none of them is
+        virtual, otherwise the full model objects will be loaded.
+        '''
+        if has_virtual_columns:
+            self._entity_cols[:] = []
+
+        self._value_formatters = self._create_value_formatters()
+        self._row_builders = self._create_row_builders()
+
         if len(missing_columns) > 0:
             msg = QApplication.translate(
                 'EntityBrowser',
@@ -512,25 +850,91 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
                 msg
             )
 
+    def _create_value_formatters(self):
+        """
+        Creates the functions for formatting the value of each entity
+        attribute for display so that the corresponding formatter is only
+        resolved once.
+        :return: Formatting functions in column order, None for columns
+        whose values are displayed as is.
+        :rtype: list
+        """
+        value_formatters = []
+
+        for attr in self._entity_attrs:
+            formatter = self._cell_formatters.get(attr, None)
+
+            if formatter is None:
+                value_formatters.append(None)
+            else:
+                value_formatters.append(
+                    _value_formatter(
+                        formatter,
+                        attr in self._shared_value_attrs
+                    )
+                )
+
+        return value_formatters
+
+    def _display_formatters(self):
+        """
+        :return: Returns the formatting functions used by the table model to
+        format the cell values when they are displayed. Values of virtual
+        columns are already formatted when the rows are built.
+        :rtype: list
+        """
+        return [
+            None if attr in self._virtual_attrs else f
+            for attr, f in zip(self._entity_attrs, self._value_formatters)
+        ]
+
+    def _create_row_builders(self, positional=False):
+        """
+        Creates the functions for extracting the value of each entity
+        attribute from a record so that the attribute lookup is only resolved
+        once. The values are formatted by the table model once they are
+        displayed, except for virtual columns whose values are related model
+        objects which are formatted when the row is built.
+        :param positional: True if the values are read by position from
+        records with projected columns, otherwise they are read by attribute
+        name from model objects.
+        :type positional: bool
+        :return: Functions for building a row, in column order.
+        :rtype: list
+        """
+        builders = []
+
+        for i, attr in enumerate(self._entity_attrs):
+            if positional:
+                getter = itemgetter(i)
+            else:
+                getter = attrgetter(attr)
+
+            value_formatter = self._value_formatters[i]
+            if attr in self._virtual_attrs and value_formatter is not None:
+                getter = _formatted_value_getter(getter, value_formatter)
+
+            builders.append(getter)
+
+        return builders
+
     def _select_record(self, id):
         #Selects record with the given ID.
         if id is None:
             return
 
-        m = self.tbEntity.model()
         s = self.tbEntity.selectionModel()
 
-        start_idx = m.index(0, 0)
-        idxs = m.match(
-            start_idx,
-            Qt.DisplayRole,
-            id,
-            1,
-            Qt.MatchExactly
+        src_row = self._tableModel.row_for_id(id)
+        if src_row == -1:
+            return
+
+        sel_idx = self._proxyModel.mapFromSource(
+            self._tableModel.index(src_row, 0)
         )
 
-        if len(idxs) > 0:
-            sel_idx = idxs[0]
+        # Record might have been filtered out
+        if sel_idx.isValid():
              #Select item
             s.select(
                 sel_idx,
@@ -549,10 +953,10 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
             return
 
         #Get document objects
-        ent_obj = self._dbmodel()
+        entity_records = self._models_from_ids(sel_rec_ids)
 
         for sel_id in sel_rec_ids:
-            er = ent_obj.queryObject().filter(self._dbmodel.id == sel_id).first()
+            er = entity_records.get(sel_id, None)
             if not er is None:
                 docs = er.documents
 
@@ -590,6 +994,10 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
             )
 
         else:
+            # Stop any records that are still being fetched and ignore
+            # those that have already been fetched.
+            self._stop_loader()
+            self._load_generation += 1
 
             self._init_entity_columns()
 
@@ -600,121 +1008,365 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
             if filtered_records is not None:
                 self.current_records = filtered_records.rowcount
 
-            numRecords = self.recomputeRecordCount(init_data=True)
+            # Filtered records are not cached
+            self._unfiltered_records = filtered_records is None and \
+                        len(self.filtered_records) == 0
+            self._cache_records = self._unfiltered_records
+            self._cache_version = _result_version(self._entity.name)
+            cached_rows = None
+            if self._cache_records:
+                cached_rows = _cached_result(
+                    self._entity.name,
+                    self.record_limit,
+                    self._headers
+                )
+
+            # Detach the previous model while the records are reloaded
+            if self.tbEntity.model() is not None:
+                self.tbEntity.setModel(None)
+
+            '''
+            Records are added to the model once it has been set in the view.
+            The cell values are only formatted when they are displayed.
+            '''
+            if cached_rows is not None:
+                self._tableModel = BaseSTDMTableModel(
+                    list(cached_rows),
+                    self._headers,
+                    self,
+                    self._display_formatters()
+                )
+                self._cache_records = False
+            else:
+                self._tableModel = BaseSTDMTableModel(
+                    [], self._headers, self, self._display_formatters()
+                )
+
+            self._loaded_rows = []
+            self._loading = True
+
+            if self.plugin is not None:
+                self.plugin.entity_table_model[self._entity.name] = \
+                        self._tableModel
+
+            self._init_view()
+
+            if cached_rows is not None:
+                self._on_records_loaded()
+
+                return
+
+            num_attrs = len(self._entity_attrs)
+
+            # Only one filter is possible.
+            if len(self.filtered_records) > 0:
+                self._load_records(self.filtered_records, self._row_builders)
+
+            elif len(self._entity_cols) == num_attrs:
+                '''
+                Only select the columns shown in the view and fetch them in a
+                separate thread so that the dialog remains responsive.
+                Projected rows are tuples in column order.
+                '''
+                self._record_builders = self._create_row_builders(True)
+                self._loader = _EntityLoader(
+                    self._entity_cols,
+                    self.record_limit,
+                    generation=self._load_generation
+                )
+                self._loader.signals.chunkReady.connect(
+                    self._on_records_chunk_ready
+                )
+                self._loader.signals.error.connect(self._on_loader_error)
+                self._loader.signals.finished.connect(self._on_loader_finished)
+
+                # Stop fetching if the browser is deleted while loading
+                self.destroyed.connect(self._loader.cancel)
+
+                QThreadPool.globalInstance().start(self._loader)
 
-            # Load progress dialog
+            else:
+                # Stream the model objects in batches rather than loading
+                # all of them into memory at once.
+                entity_cls = self._dbmodel()
+                entity_records = entity_cls.queryObject().limit(
+                    self.record_limit
+                ).yield_per(FETCH_CHUNK_SIZE)
+
+                self._load_records(entity_records, self._row_builders)
+
+    def _init_view(self):
+        """
+        Sets up the filter columns and the proxy model for the table view.
+        """
+        '''
+        Use sortfilter proxy model for the view. Records are only sorted and
+        filtered once they have all been loaded. The proxy model is created
+        first since adding filter columns can change the filter column.
+        '''
+        self._proxyModel = VerticalHeaderSortFilterProxyModel()
+        self._proxyModel.setDynamicSortFilter(False)
+        self._proxyModel.setSourceModel(self._tableModel)
+        self._proxyModel.setSortCaseSensitivity(Qt.CaseInsensitive)
+        self._proxyModel.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        '''
+        Add filter columns, replacing those added by a previous load. The
+        signals are blocked since the filter column is set below.
+        '''
+        filter_idx = self.cboFilterColumn.currentIndex()
+        self.cboFilterColumn.blockSignals(True)
+        self.cboFilterColumn.clear()
+
+        for header, info in self._searchable_columns.iteritems():
+            column_name, index = info['name'], info['header_index']
+            if column_name != 'id':
+                self.cboFilterColumn.addItem(header, info)
+
+        if 0 < filter_idx < self.cboFilterColumn.count():
+            self.cboFilterColumn.setCurrentIndex(filter_idx)
+
+        self.cboFilterColumn.blockSignals(False)
+
+        #Use the selected column in the combo for filtering
+        if self.cboFilterColumn.count() > 0:
+            self.set_proxy_model_filter_column(
+                self.cboFilterColumn.currentIndex()
+            )
+
+        self.tbEntity.setModel(self._proxyModel)
+
+        #First (ID) column will always be hidden
+        self.tbEntity.hideColumn(0)
+
+        self.tbEntity.horizontalHeader().setResizeMode(QHeaderView.Interactive)
+
+    def _add_records(self, records, row_builders):
+        """
+        Builds the rows from the given records and adds them to the table
+        model.
+        :param records: Model objects or projected rows.
+        :type records: list
+        :param row_builders: Functions for building a row from a record.
+        :type row_builders: list
+        :return: Returns True if the records were successfully added,
+        otherwise False.
+        :rtype: bool
+        """
+        try:
+            rows = [tuple([b(er) for b in row_builders]) for er in records]
+        except Exception as ex:
+            self._on_load_error(unicode(ex.message))
+
+            return False
+
+        self._tableModel.appendRows(rows)
+        self._loaded_rows.extend(rows)
+
+        # Small tables load without showing the progress dialog
+        if self._tableModel.rowCount() >= PROGRESS_DIALOG_THRESHOLD:
+            self._show_progress()
+
+        return True
+
+    def _show_progress(self):
+        """
+        Shows the progress dialog while the records are being loaded. The
+        dialog is created once and reused each time the records are
+        reloaded.
+        """
+        if self._progressDialog is None:
+            # The number of records is only known once they have been fetched
             progressLabel = QApplication.translate(
                 "EntityBrowser", "Fetching Records..."
             )
-            progressDialog = QProgressDialog(
-                progressLabel, None, 0, numRecords, self
+            self._progressDialog = QProgressDialog(
+                progressLabel, None, 0, 0, self
             )
 
-            QApplication.processEvents()
-            progressDialog.show()
-            progressDialog.setValue(0)
+        if not self._progressDialog.isVisible():
+            self._progressDialog.show()
 
-            # Add records to nested list for enumeration in table model
-            load_data = True
-            if self.plugin is not None:
-                if self._entity.name in self.plugin.entity_table_model.keys():
-                    if filtered_records is None:
-                        self._tableModel = self.plugin.entity_table_model[
-                            self._entity.name
-                        ]
-            if isinstance(self._parent, EntityEditorDialog):
-                load_data = True
-
-            if load_data:
-                # Only one filter is possible.
-                if len(self.filtered_records) > 0:
-                    entity_records = self.filtered_records
-                else:
-                    entity_cls = self._dbmodel()
-                    entity_records = entity_cls.queryObject().filter().limit(
-                        self.record_limit
-                    ).all()
-
-            # if self._tableModel is None:
-                entity_records_collection = []
-                for i, er in enumerate(entity_records):
-                    if i == self.record_limit:
-                        break
+    def _hide_progress(self):
+        # Hides the progress dialog if it has been shown.
+        if not self._progressDialog is None:
+            self._progressDialog.hide()
+
+    def _load_records(self, entity_records, row_builders):
+        """
+        Adds the records to the table model in chunks in the GUI thread.
+        :param entity_records: Model objects to be added.
+        :type entity_records: iterable
+        :param row_builders: Functions for building a row from a record.
+        :type row_builders: list
+        """
+        records_chunk = []
+        generation = self._load_generation
+
+        # Only repaint the view once all the records have been added
+        self.tbEntity.setUpdatesEnabled(False)
+
+        try:
+            for i, er in enumerate(entity_records):
+                if i == self.record_limit:
+                    break
+
+                records_chunk.append(er)
+
+                if len(records_chunk) == FETCH_CHUNK_SIZE:
+                    if not self._add_records(records_chunk, row_builders):
+                        return
+
+                    records_chunk = []
                     QApplication.processEvents()
-                    entity_row_info = []
-                    progressDialog.setValue(i)
-                    try:
-                        for attr in self._entity_attrs:
-                            attr_val = getattr(er, attr)
-
-                            # Check if there are display formatters and apply if
-                            # one exists for the given attribute.
-                            if attr_val is not None: # No need of formatter for None value
-                                if attr in self._cell_formatters:
-                                    formatter = self._cell_formatters[attr]
-                                    attr_val = formatter.format_column_value(attr_val)
-                            entity_row_info.append(attr_val)
-                    except Exception as ex:
-                        QMessageBox.critical(
-                            self,
-                            QApplication.translate(
-                                'EntityBrowser', 'Loading Records'
-                            ),
-                            unicode(ex.message))
+
+                    # The records might have been reloaded or the dialog
+                    # closed while processing events.
+                    if generation != self._load_generation:
                         return
 
-                    entity_records_collection.append(entity_row_info)
+            # Add remaining records
+            if not self._add_records(records_chunk, row_builders):
+                return
 
+        except Exception as ex:
+            # Errors raised while fetching the records
+            self._on_load_error(unicode(ex))
 
-                self._tableModel = BaseSTDMTableModel(
-                    entity_records_collection, self._headers, self
-                )
+            return
 
-                if self.plugin is not None:
-                    self.plugin.entity_table_model[self._entity.name] = \
-                            self._tableModel
+        finally:
+            self.tbEntity.setUpdatesEnabled(True)
 
-            # Add filter columns
-            for header, info in self._searchable_columns.iteritems():
-                column_name, index = info['name'], info['header_index']
-                if column_name != 'id':
-                    self.cboFilterColumn.addItem(header, info)
+        self._on_records_loaded()
 
-            #Use sortfilter proxy model for the view
-            self._proxyModel = VerticalHeaderSortFilterProxyModel()
-            self._proxyModel.setDynamicSortFilter(True)
-            self._proxyModel.setSourceModel(self._tableModel)
-            self._proxyModel.setSortCaseSensitivity(Qt.CaseInsensitive)
+    def _stop_loader(self):
+        """
+        Cancels the loader, if any, that is fetching the records in a worker
+        thread.
+        """
+        if self._loader is None:
+            return
 
-            #USe first column in the combo for filtering
-            if self.cboFilterColumn.count() > 0:
-                self.set_proxy_model_filter_column(0)
+        self._loader.cancel()
 
-            self.tbEntity.setModel(self._proxyModel)
-            if numRecords < self.record_limit:
-                self.tbEntity.setSortingEnabled(True)
-                self.tbEntity.sortByColumn(1, Qt.AscendingOrder)
+        try:
+            self.destroyed.disconnect(self._loader.cancel)
+        except TypeError:
+            pass
 
-            #First (ID) column will always be hidden
-            self.tbEntity.hideColumn(0)
+        self._loader = None
 
-            self.tbEntity.horizontalHeader().setResizeMode(QHeaderView.Interactive)
+    def _on_records_chunk_ready(self, generation, records):
+        # Slot raised when a chunk of records has been fetched by the loader.
+        if generation != self._load_generation:
+            return
 
-            self.tbEntity.resizeColumnsToContents()
+        if not self._add_records(records, self._record_builders):
+            self._stop_loader()
 
-            #Connect signals
-            self.connect(self.cboFilterColumn, SIGNAL('currentIndexChanged (int)'), self.onFilterColumnChanged)
-            self.connect(self.txtFilterPattern, SIGNAL('textChanged(const QString&)'), self.onFilterRegExpChanged)
+    def _on_loader_error(self, generation, message):
+        # Slot raised when the loader fails to fetch the records.
+        if generation != self._load_generation:
+            return
 
-            #Select record with the given ID if specified
-            if not self._select_item is None:
-                self._select_record(self._select_item)
+        self._stop_loader()
+        self._on_load_error(message)
 
-            if numRecords > 0:
-                # Set maximum value of the progress dialog
-                progressDialog.setValue(numRecords)
-            else:
-                progressDialog.hide()
+    def _on_loader_finished(self, generation):
+        # Slot raised when the loader has fetched all the records.
+        if generation != self._load_generation:
+            return
+
+        self._stop_loader()
+        self._on_records_loaded()
+
+    def _on_load_error(self, message):
+        # Slot raised when an error occurs while loading the records.
+        self._loading = False
+        self._hide_progress()
+
+        QMessageBox.critical(
+            self,
+            QApplication.translate(
+                'EntityBrowser', 'Loading Records'
+            ),
+            message
+        )
+
+    def _on_records_loaded(self):
+        """
+        Updates the record count, sorting and selection in the view once all
+        the records have been added to the table model.
+        """
+        self._loading = False
+
+        # The loaded records are stale if they were invalidated while loading
+        if self._cache_records and \
+                self._cache_version == _result_version(self._entity.name):
+            _cache_result(
+                self._entity.name,
+                self.record_limit,
+                list(self._headers),
+                self._loaded_rows,
+                self.RESULT_CACHE_TTL
+            )
+        self._loaded_rows = []
+
+        '''
+        If the record limit has not been reached then all the records in
+        the table have been loaded hence there is no need of counting
+        them in the database.
+        '''
+        known_count = None
+        num_loaded = self._tableModel.rowCount()
+        if self._unfiltered_records and num_loaded < self.record_limit:
+            known_count = num_loaded
+
+        numRecords = self.recomputeRecordCount(
+            init_data=True,
+            known_count=known_count
+        )
+
+        self._proxyModel.setDynamicSortFilter(True)
+
+        if numRecords < self.record_limit:
+            # Enabling sorting sorts the records by the indicator column
+            self.tbEntity.horizontalHeader().setSortIndicator(
+                1,
+                Qt.AscendingOrder
+            )
+            self.tbEntity.setSortingEnabled(True)
+
+        self._resize_columns()
+
+        #Select record with the given ID if specified
+        if not self._select_item is None:
+            self._select_record(self._select_item)
+
+        self._hide_progress()
+
+    def _resize_columns(self):
+        """
+        Resizes the columns in the table view without measuring the contents
+        of all the rows.
+        """
+        hdr = self.tbEntity.horizontalHeader()
+
+        # Only sample the first rows when measuring the contents (Qt 5.2+)
+        if hasattr(hdr, 'setResizeContentsPrecision'):
+            hdr.setResizeContentsPrecision(RESIZE_CONTENTS_PRECISION)
+            self.tbEntity.resizeColumnsToContents()
+
+            return
+
+        # Otherwise fit the columns to the header text
+        fm = hdr.fontMetrics()
+        for i, header in enumerate(self._headers):
+            self.tbEntity.setColumnWidth(
+                i,
+                fm.width(header) + HEADER_WIDTH_PADDING
+            )
 
     def _header_index_from_filter_combo_index(self, idx):
         col_info = self.cboFilterColumn.itemData(idx)
@@ -737,10 +1389,18 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
 
     def onFilterRegExpChanged(self,text):
         '''
-        Slot raised whenever the filter text changes.
+        Slot raised whenever the filter text changes. The records are only
+        filtered once the user pauses typing.
         '''
-        regExp = QRegExp(text,Qt.CaseInsensitive,QRegExp.FixedString)
-        self._proxyModel.setFilterRegExp(regExp)
+        self._pending_filter_text = text
+        self._filter_timer.start()
+
+    def _apply_filter(self):
+        # Filter the records using the last text entered by the user
+        if self._proxyModel is None:
+            return
+
+        self._proxyModel.setFilterFixedString(self._pending_filter_text)
 
     def onDoubleClickView(self,modelindex):
         '''
@@ -766,14 +1426,25 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
 
             return selected_ids
 
-        for proxyRowIndex in sel_row_indices:
-            #Get the index of the source or else the row items will have unpredictable behavior
-            row_index = self._proxyModel.mapToSource(proxyRowIndex)
-            entity_id = row_index.data(Qt.DisplayRole)
-            selected_ids.append(entity_id)
+        #Get the rows in the source or else the row items will have unpredictable behavior
+        id_for_row = self._tableModel.id_for_row
+        selected_ids = [
+            id_for_row(r) for r in self._source_rows(sel_row_indices)
+        ]
 
         return selected_ids
 
+    def _source_rows(self, proxy_indices):
+        """
+        :param proxy_indices: Indices in the proxy model.
+        :type proxy_indices: list
+        :return: Returns the corresponding row numbers in the table model.
+        :rtype: list
+        """
+        map_to_source = self._proxyModel.mapToSource
+
+        return [map_to_source(idx).row() for idx in proxy_indices]
+
     def onAccept(self):
         '''
         Slot raised when user clicks to accept the dialog. The resulting action will be dependent
@@ -801,32 +1472,39 @@ class EntityBrowser(SupportsManageMixin, QDialog, Ui_EntityBrowser):
         Convenience method for adding model info into the view.
         '''
         insertPosition = self._tableModel.rowCount()
-        self._tableModel.insertRows(insertPosition, 1)
 
-        for i, attr in enumerate(self._entity_attrs):
+        # Add the row at once rather than setting each cell value
+        row = tuple([b(model_obj) for b in self._row_builders])
+        self._tableModel.appendRows([row])
 
-            prop_idx = self._tableModel.index(insertPosition, i)
-            attr_val = getattr(model_obj, attr)
+        return insertPosition
 
-            '''
-            Check if there are display formatters and apply if one exists
-            for the given attribute.
-            '''
-            if attr in self._cell_formatters:
-                formatter = self._cell_formatters[attr]
-                attr_val = formatter.format_column_value(attr_val)
+    def _models_from_ids(self, ids):
+        '''
+        Convenience method that returns the model objects with the given IDs
+        using a single query.
+        :return: Model objects keyed by their ID.
+        :rtype: dict
+        '''
+        if len(ids) == 0:
+            return {}
 
-            self._tableModel.setData(prop_idx, attr_val)
-        return insertPosition
+        dbHandler = self._dbmodel()
+        modelObjs = dbHandler.queryObject().filter(
+            self._dbmodel.id.in_(ids)
+        ).all()
+
+        return dict((m.id, m) for m in modelObjs)
 
     def _model_from_id(self, record_id, row_number):
         '''
         Convenience method that returns the model object based on its ID.
+        The lookup goes through the session's identity map and the mapper's
+        primary key clause hence no query is built or emitted for records
+        that have already been loaded.
         '''
         dbHandler = self._dbmodel()
-        modelObj = dbHandler.queryObject().filter(
-            self._dbmodel.id == record_id
-        ).first()
+        modelObj = dbHandler.queryObject().get(record_id)
 
         if modelObj is None:
             modelObj = self.child_model[row_number+1]
@@ -856,7 +1534,7 @@ class EntityBrowserWithEditor(EntityBrowser):
             self._newEntityAction = QAction(QIcon(":/plugins/stdm/images/icons/add.png"),
                                             add, self)
 
-            self.connect(self._newEntityAction,SIGNAL("triggered()"),self.onNewEntity)
+            self._newEntityAction.triggered.connect(self.onNewEntity)
 
             self._editEntityAction = QAction(QIcon(":/plugins/stdm/images/icons/edit.png"),
                                              edit,self)
@@ -865,14 +1543,14 @@ class EntityBrowserWithEditor(EntityBrowser):
             )
 
 
-            self.connect(self._editEntityAction,SIGNAL("triggered()"),self.onEditEntity)
+            self._editEntityAction.triggered.connect(self.onEditEntity)
 
             self._removeEntityAction = QAction(QIcon(":/plugins/stdm/images/icons/remove.png"),
                                   remove, self)
             self._removeEntityAction.setObjectName(
                 QApplication.translate("EntityBrowserWithEditor", "remove_tool")
             )
-            self.connect(self._removeEntityAction,SIGNAL("triggered()"),self.onRemoveEntity)
+            self._removeEntityAction.triggered.connect(self.onRemoveEntity)
 
             #Manage position of the actions based on whether the entity
             # supports documents.
@@ -964,12 +1642,17 @@ class EntityBrowserWithEditor(EntityBrowser):
 
             result = self.addEntityDlg.exec_()
 
+        # Records might have been saved by the editor or GPS tool
+        invalidate_result_cache(self._entity.name)
+
         if result == QDialog.Accepted:
             model_obj = self.addEntityDlg.model()
             if self.addEntityDlg.is_valid:
                 if self.parent_entity is None:
                     self.addModelToView(model_obj)
-                    self.recomputeRecordCount()
+                    self.recomputeRecordCount(
+                        known_count=self._num_records + 1
+                    )
 
     def on_save_and_new(self, model):
         """
@@ -979,9 +1662,15 @@ class EntityBrowserWithEditor(EntityBrowser):
         :type model: SQL Alchemy Model
         """
         if model is not None:
+            invalidate_result_cache(self._entity.name)
             insert_position = self.addModelToView(model)
             self.set_child_model(model, insert_position + 1)
-            self.recomputeRecordCount()
+
+            # Child records are only saved together with the parent record
+            if self.parent_entity is None:
+                self.recomputeRecordCount(known_count=self._num_records + 1)
+            else:
+                self.recomputeRecordCount()
 
     def _can_add_edit(self):
         """
@@ -1088,37 +1777,30 @@ class EntityBrowserWithEditor(EntityBrowser):
         if response == QMessageBox.No:
             return
 
-        while len(sel_row_indices) > 0:
-
-            ri = sel_row_indices[0]
-            source_row_index = self._proxyModel.mapToSource(ri)
-            record_id = source_row_index.data()
-
-            row_number = source_row_index.row()
-
-            #Delete record
-            result = self._delete_record(record_id, row_number)
-
-            if not result:
-                title = QApplication.translate(
-                'EntityBrowserWithEditor',
-                'Delete Record(s)'
-                )
+        # Get the IDs and row numbers of all the selected records
+        id_for_row = self._tableModel.id_for_row
+        records = [
+            (id_for_row(r), r) for r in self._source_rows(sel_row_indices)
+        ]
 
-                msg =  QApplication.translate(
-                'EntityBrowserWithEditor',
-                'An error occurred while attempting to delete a record, this '
-                'is most likely caused by a dependency issue.\nPlease check '
-                'if the record has dependencies such as social tenure '
-                'relationship or related entities. If it has then delete '
-                'these dependencies first.'
-                )
-                QMessageBox.critical(self, title, msg)
+        #Delete records
+        result = self._delete_records(records)
 
-                break
+        if not result:
+            title = QApplication.translate(
+            'EntityBrowserWithEditor',
+            'Delete Record(s)'
+            )
 
-            #Refresh list of selected records
-            sel_row_indices = self.tbEntity.selectionModel().selectedRows(0)
+            msg =  QApplication.translate(
+            'EntityBrowserWithEditor',
+            'An error occurred while attempting to delete a record, this '
+            'is most likely caused by a dependency issue.\nPlease check '
+            'if the record has dependencies such as social tenure '
+            'relationship or related entities. If it has then delete '
+            'these dependencies first.'
+            )
+            QMessageBox.critical(self, title, msg)
 
 
     def remove_rows(self):
@@ -1165,56 +1847,71 @@ class EntityBrowserWithEditor(EntityBrowser):
             updated_model_obj = edit_entity_dlg.model()
             if not edit_entity_dlg.is_valid:
                 return
-            for i, attr in enumerate(self._entity_attrs):
-                prop_idx = self._tableModel.index(rownumber, i)
-                attr_val = getattr(updated_model_obj, attr)
 
-                '''
-                Check if there are display formatters and apply if
-                one exists for the given attribute.
-                '''
-                if attr in self._cell_formatters:
-                    formatter = self._cell_formatters[attr]
-                    attr_val = formatter.format_column_value(attr_val)
+            invalidate_result_cache(self._entity.name)
 
-                self._tableModel.setData(prop_idx, attr_val)
+            # Values are formatted by the table model when displayed
+            for i, b in enumerate(self._row_builders):
+                prop_idx = self._tableModel.index(rownumber, i)
+                self._tableModel.setData(prop_idx, b(updated_model_obj))
 
-    def _delete_record(self, rec_id, row_number):
+    def _delete_records(self, records):
         """
-        Delete the record with the given id and remove it from the table view.
+        Delete the records with the given ids and remove them from the table
+        view. The records are fetched from the database in a single query and
+        deleted in a single transaction. If the transaction fails, they are
+        deleted one at a time.
+        :param records: Tuples containing the record id and the corresponding
+        row number in the table model.
+        :type records: list
+        :return: Returns True if all the records were deleted, otherwise
+        False.
+        :rtype: bool
         """
         del_result = True
+        num_deleted = 0
+        entities = self._models_from_ids([r[0] for r in records])
 
-        if self.parent_entity is not None:
-            idx = row_number+1
-            if idx in self.child_model:
-                del self.child_model[idx]
-                del self._parent.child_models[idx, self.entity]
+        # Invalidated beforehand since a failed delete raises an error after
+        # some of the records might have already been deleted.
+        invalidate_result_cache(self._entity.name)
 
-            self._tableModel.removeRows(row_number, 1)
-            # Update number of records
-            self.recomputeRecordCount()
+        batch_deleted = self._delete_models(entities.values())
 
-            #Clear previous notifications
-            self._notifBar.clear()
+        # Remove rows from the bottom so that the row numbers of the
+        # remaining records do not change.
+        for rec_id, row_number in sorted(
+                records, key=itemgetter(1), reverse=True
+        ):
+            #Remove record from the database
+            entity = entities.get(rec_id, None)
 
-        #Remove record from the database
-        dbHandler = self._dbmodel()
-        entity = dbHandler.queryObject().filter(
-            self._dbmodel.id == rec_id
-        ).first()
+            if entity:
+                if not batch_deleted:
+                    result = entity.delete()
 
-        if entity:
-            result = entity.delete()
+                    if not result:
+                        del_result = False
+
+                        break
+
+                num_deleted += 1
+
+            elif self.parent_entity is None:
+                continue
 
-            if not result:
-                return False
+            if self.parent_entity is not None:
+                idx = row_number+1
+                if idx in self.child_model:
+                    del self.child_model[idx]
+                    del self._parent.child_models[idx, self.entity]
 
             self._tableModel.removeRows(row_number, 1)
 
-            #Clear previous notifications
-            self._notifBar.clear()
+        #Clear previous notifications
+        self._notifBar.clear()
 
+        if num_deleted > 0:
             #Notify user
             delMsg = QApplication.translate(
                 "EntityBrowserWithEditor",
@@ -1224,10 +1921,43 @@ class EntityBrowserWithEditor(EntityBrowser):
             self._notifBar.insertInformationNotification(delMsg)
 
             #Update number of records
+            self.recomputeRecordCount(
+                known_count=self._num_records - num_deleted
+            )
+
+        elif self.parent_entity is not None:
+            # Update number of records
             self.recomputeRecordCount()
 
         return del_result
 
+    def _delete_models(self, models):
+        """
+        Deletes the given model objects in a single transaction.
+        :param models: Model objects to be deleted.
+        :type models: list
+        :return: Returns True if the model objects were deleted, otherwise
+        False in which case the transaction is rolled back.
+        :rtype: bool
+        """
+        if len(models) == 0:
+            return False
+
+        session = STDMDb.instance().session
+
+        try:
+            for m in models:
+                session.delete(m)
+
+            session.commit()
+
+            return True
+
+        except SQLAlchemyError:
+            session.rollback()
+
+            return False
+
     def onDoubleClickView(self, modelindex):
         '''
         Override for loading editor dialog.
@@ -1265,14 +1995,10 @@ class EntityBrowserWithEditor(EntityBrowser):
         """
         sel_row_indices = self.tbEntity.\
             selectionModel().selectedRows(0)
-        record_ids = []
-
-        for sel_row_index in sel_row_indices:
-            rowIndex = self._proxyModel.mapToSource(
-                sel_row_index
-            )
-            record_id = rowIndex.data()
-            record_ids.append(record_id)
+        id_for_row = self._tableModel.id_for_row
+        record_ids = [
+            id_for_row(r) for r in self._source_rows(sel_row_indices)
+        ]
 
         self.record_feature_highlighter(record_ids)
 
@@ -61,7 +61,8 @@ from stdm.data.configuration.db_items import DbItem
 from stdm.data.pg_utils import (
         pg_table_exists, 
         pg_table_count,
-        table_column_names
+        table_column_names,
+        clear_table_column_names_cache
 )
 from stdm.settings.config_serializer import ConfigurationFileSerializer 
 from stdm.settings.registryconfig import RegistryConfig 
@@ -1403,6 +1404,9 @@ class ConfigWizard(QWizard, Ui_STDMWizard):
         self.txtHtml.append(msg)
 
     def config_update_completed(self, status):
+        # Tables might have been altered by the update
+        clear_table_column_names_cache()
+
         self.button(QWizard.CancelButton).setEnabled(True)
         self.button(QWizard.CustomButton1).setEnabled(True)
         if status: